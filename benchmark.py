@@ -0,0 +1,621 @@
+"""
+Benchmark and load-test harness for the transcription pipeline.
+
+Covers the main stages of the app:
+- audio extraction with ffmpeg
+- Whisper real-time factor on a speech clip (see --generate-audio)
+- segment_transcript throughput
+- concurrent load against /process-video/ and /process-youtube/
+
+Network dependencies (YouTube transcript API, yt-dlp downloads and Supabase
+storage) are replaced by local fake servers so runs are reproducible offline.
+Results are written as JSON and can be compared against a saved baseline.
+
+Usage:
+    python benchmark.py --generate-audio
+    python benchmark.py --output results.json
+    python benchmark.py --stages segment,youtube --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+BUNDLED_AUDIO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio.wav")
+# --generate-audio writes here (gitignored) so the tracked placeholder stays untouched
+GENERATED_AUDIO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_audio.wav")
+
+
+def resolve_audio_path() -> str:
+    """Generated speech clip if present, otherwise the bundled audio.wav"""
+    if os.path.exists(GENERATED_AUDIO_PATH) and os.path.getsize(GENERATED_AUDIO_PATH) > 0:
+        return GENERATED_AUDIO_PATH
+    return BUNDLED_AUDIO_PATH
+
+
+AUDIO_PATH = resolve_audio_path()
+ALL_STAGES = ["extract", "whisper", "segment", "youtube", "youtube_fallback", "video"]
+# Stages that read the speech clip; segment and youtube (captions path) run without it
+AUDIO_STAGES = {"extract", "whisper", "youtube_fallback", "video"}
+
+# Video IDs the fake transcript server knows about; anything else gets a 404,
+# which sends /process-youtube/ down the yt-dlp + Whisper fallback path.
+FAKE_TRANSCRIPT_VIDEO_ID = "benchmark01"
+FAKE_MISSING_VIDEO_ID = "benchmark404"
+
+SAMPLE_TEXT = (
+    "Sign languages are full natural languages with their own grammar and lexicon. "
+    "They are not simply a manual representation of spoken languages, and they vary "
+    "from country to country, region to region. Machine translation between spoken "
+    "and signed languages is an open research problem! Does it work for long inputs? "
+    "Long run-on sentences that keep going with clause after clause, separated only "
+    "by commas, with no terminal punctuation for quite a while, are a good stress case, "
+    "because the segmenter has to fall back to splitting on commas instead of sentences. "
+)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Linear-interpolated percentile of a list of samples"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies: list[float], wall_time: float, errors: int = 0, **extra) -> dict:
+    """Summarize latency samples (seconds) into the JSON report format"""
+    summary = {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "throughput_per_s": round(len(latencies) / wall_time, 3) if wall_time > 0 else 0.0,
+    }
+    summary.update(extra)
+    return summary
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+# ---------------------------------------------------------------------------
+# Local fake servers
+# ---------------------------------------------------------------------------
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    """
+    Single local HTTP server standing in for the external services:
+    - GET  /transcripts/<video_id>      -> YouTube transcript API
+    - GET  /media/<video_id>.wav        -> yt-dlp audio download
+    - POST /storage/v1/object/<bucket>/<name> -> Supabase storage upload
+    """
+
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith("/transcripts/"):
+            video_id = self.path.rsplit("/", 1)[-1]
+            if video_id != FAKE_TRANSCRIPT_VIDEO_ID:
+                self._send_json(404, {"error": "No transcript"})
+                return
+            sentences = [s for s in SAMPLE_TEXT.split(". ") if s]
+            self._send_json(200, [{"text": s, "start": i * 2.0, "duration": 2.0}
+                                  for i, s in enumerate(sentences * 4)])
+        elif self.path.startswith("/media/"):
+            with open(AUDIO_PATH, "rb") as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/wav")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if self.path.startswith("/storage/v1/object/"):
+            key = self.path[len("/storage/v1/object/"):]
+            self._send_json(200, {"Key": key})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+
+@contextmanager
+def fake_services(latency: float = 0.0):
+    """Run the fake external services on a random local port"""
+    handler = type("Handler", (FakeServicesHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_fake_transcript_api(base_url: str):
+    """Build a YouTubeTranscriptApi stand-in that talks to the fake server"""
+
+    class FakeTranscript:
+        def __init__(self, video_id):
+            self.video_id = video_id
+
+        def fetch(self):
+            with urlopen(f"{base_url}/transcripts/{self.video_id}") as response:
+                items = json.load(response)
+            return [SimpleNamespace(**item) for item in items]
+
+    class FakeTranscriptList:
+        def __init__(self, video_id):
+            self.video_id = video_id
+
+        def find_transcript(self, language_codes):
+            if "en" not in language_codes:
+                raise Exception(f"No transcript for {language_codes}")
+            return FakeTranscript(self.video_id)
+
+    class FakeTranscriptApi:
+        @staticmethod
+        def list_transcripts(video_id):
+            try:
+                urlopen(f"{base_url}/transcripts/{video_id}").close()
+            except HTTPError as e:
+                raise Exception(f"Transcripts are disabled for video {video_id}") from e
+            return FakeTranscriptList(video_id)
+
+    return FakeTranscriptApi
+
+
+def make_fake_youtube_dl(base_url: str):
+    """Build a yt_dlp.YoutubeDL stand-in that downloads from the fake server"""
+
+    class FakeYoutubeDL:
+        def __init__(self, opts):
+            self.outtmpl = opts["outtmpl"]
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def download(self, urls):
+            from transcribe import get_youtube_video_id
+            for url in urls:
+                video_id = get_youtube_video_id(url)
+                with urlopen(f"{base_url}/media/{video_id}.wav") as response, \
+                        open(self.outtmpl + ".wav", "wb") as out:
+                    shutil.copyfileobj(response, out)
+
+    return FakeYoutubeDL
+
+
+@contextmanager
+def patched_app(base_url: str):
+    """
+    Point the app at the fake services and disable rate limiting,
+    so the load stages exercise real request handling without the network.
+    """
+    import main
+    import transcribe
+    from supabase import create_client
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(
+            transcribe, "YouTubeTranscriptApi", make_fake_transcript_api(base_url)))
+        stack.enter_context(mock.patch.object(
+            transcribe.yt_dlp, "YoutubeDL", make_fake_youtube_dl(base_url)))
+        stack.enter_context(mock.patch.object(
+            main, "supabase", create_client(base_url, "benchmark.anon.key")))
+        stack.enter_context(mock.patch.object(main, "SUPABASE_URL", base_url))
+        stack.enter_context(mock.patch.object(main, "BUCKET_NAME", "video-to-sign", create=True))
+        stack.enter_context(mock.patch.object(main.limiter, "enabled", False))
+        yield main.app
+
+
+@contextmanager
+def app_server(app):
+    """Serve the FastAPI app with uvicorn on a random local port"""
+    import uvicorn
+
+    port = free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        wait_for_port(port)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def audio_available() -> bool:
+    return os.path.exists(AUDIO_PATH) and os.path.getsize(AUDIO_PATH) > 0
+
+
+def generate_audio(path: str = GENERATED_AUDIO_PATH):
+    """Synthesize SAMPLE_TEXT as 16 kHz mono speech with espeak-ng and ffmpeg"""
+    import ffmpeg
+
+    tts = shutil.which("espeak-ng") or shutil.which("espeak")
+    if not tts:
+        raise SystemExit("espeak-ng is required to generate audio (apt-get install espeak-ng)")
+    with tempfile.TemporaryDirectory() as workdir:
+        raw_path = os.path.join(workdir, "speech.wav")
+        subprocess.run([tts, "-s", "160", "-w", raw_path, SAMPLE_TEXT], check=True)
+        ffmpeg.input(raw_path).output(path, ar=16000, ac=1).run(overwrite_output=True, quiet=True)
+    print(f"Wrote {audio_duration(path):.1f}s of speech to {path}")
+
+
+def audio_duration(path: str) -> float:
+    import ffmpeg
+    return float(ffmpeg.probe(path)["format"]["duration"])
+
+
+def make_benchmark_video(workdir: str) -> str:
+    """Mux the bundled audio.wav into an mp4 so it can go through the video path"""
+    import ffmpeg
+    video_path = os.path.join(workdir, "benchmark.mp4")
+    ffmpeg.input(AUDIO_PATH).output(video_path, acodec="aac").run(overwrite_output=True, quiet=True)
+    return video_path
+
+
+def bench_extract(video_path: str, workdir: str, iterations: int) -> dict:
+    import ffmpeg
+    audio_path = os.path.join(workdir, "extract.wav")
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        ffmpeg.input(video_path).output(audio_path, format="wav").run(overwrite_output=True, quiet=True)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    duration = audio_duration(AUDIO_PATH)
+    return summarize(latencies, wall, audio_seconds=round(duration, 3),
+                     realtime_factor=round(percentile(latencies, 50) / duration, 5))
+
+
+def bench_whisper(iterations: int, model_name: str = "base") -> dict:
+    import whisper
+    t0 = time.perf_counter()
+    model = whisper.load_model(model_name)
+    load_time = time.perf_counter() - t0
+
+    latencies = []
+    text = ""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        text = model.transcribe(AUDIO_PATH)["text"]
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    duration = audio_duration(AUDIO_PATH)
+    return summarize(latencies, wall, model=model_name,
+                     model_load_ms=round(load_time * 1000, 3),
+                     audio_seconds=round(duration, 3),
+                     realtime_factor=round(percentile(latencies, 50) / duration, 5),
+                     transcript_chars=len(text))
+
+
+def bench_segment(iterations: int, repeat: int = 20) -> dict:
+    from main import segment_transcript
+    transcript = SAMPLE_TEXT * repeat
+    latencies = []
+    segments = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        segments = segment_transcript(transcript)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    return summarize(latencies, wall, input_chars=len(transcript),
+                     segments=len(segments),
+                     chars_per_s=round(len(transcript) * iterations / wall, 1))
+
+
+def encode_multipart(field: str, filename: str, content_type: str, data: bytes):
+    boundary = uuid.uuid4().hex
+    body = b"".join([
+        f"--{boundary}\r\n".encode(),
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'.encode(),
+        f"Content-Type: {content_type}\r\n\r\n".encode(),
+        data,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def run_load(make_request, requests: int, concurrency: int, check=None) -> dict:
+    """
+    Fire `requests` calls of make_request() with `concurrency` workers.
+    check(body) may return False to count a 200 response as an error.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            with urlopen(make_request(), timeout=600) as response:
+                body = response.read()
+            ok = check(body) if check else True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return summarize(latencies, wall, errors=errors, concurrency=concurrency)
+
+
+def bench_youtube(app_url: str, requests: int, concurrency: int, fallback: bool) -> dict:
+    video_id = FAKE_MISSING_VIDEO_ID if fallback else FAKE_TRANSCRIPT_VIDEO_ID
+    body = json.dumps({"youtube_url": f"https://www.youtube.com/watch?v={video_id}"}).encode()
+
+    def make_request():
+        return Request(f"{app_url}/process-youtube/", data=body,
+                       headers={"Content-Type": "application/json"}, method="POST")
+
+    return run_load(make_request, requests, concurrency)
+
+
+def bench_video(app_url: str, video_path: str, requests: int, concurrency: int) -> dict:
+    with open(video_path, "rb") as f:
+        body, content_type = encode_multipart("file", "benchmark.mp4", "video/mp4", f.read())
+
+    def make_request():
+        return Request(f"{app_url}/process-video/", data=body,
+                       headers={"Content-Type": content_type}, method="POST")
+
+    def check(response_body):
+        # Supabase failures are reported in the body of a 200 response
+        result = json.loads(response_body)
+        return "upload_result" in result and "upload_error" not in result
+
+    return run_load(make_request, requests, concurrency, check)
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+# Metrics where a larger number is an improvement; everything else compared
+# is a latency where smaller is better.
+HIGHER_IS_BETTER = {"throughput_per_s", "chars_per_s"}
+COMPARED_METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "chars_per_s", "realtime_factor"]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Compare stage metrics against a baseline report, flagging regressions"""
+    rows = []
+    for stage, metrics in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        errors, base_errors = metrics.get("errors", 0), base.get("errors", 0)
+        if errors or base_errors:
+            # Any failed request is a regression, whatever the latencies say
+            rows.append({
+                "stage": stage,
+                "metric": "errors",
+                "baseline": base_errors,
+                "current": errors,
+                "change_pct": round((errors - base_errors) / base_errors * 100, 2) if base_errors else None,
+                "regression": errors > 0,
+            })
+        no_samples = metrics.get("count") == 0 or base.get("count") == 0
+        for name in COMPARED_METRICS:
+            if name not in metrics or not base.get(name):
+                continue
+            if no_samples and name.endswith("_ms"):
+                continue
+            change = (metrics[name] - base[name]) / base[name]
+            worse = -change if name in HIGHER_IS_BETTER else change
+            rows.append({
+                "stage": stage,
+                "metric": name,
+                "baseline": base[name],
+                "current": metrics[name],
+                "change_pct": round(change * 100, 2),
+                "regression": worse > tolerance,
+            })
+    return rows
+
+
+# Environment fields that must match for a baseline comparison to mean anything
+ENVIRONMENT_KEYS = ["cpu_count", "platform"]
+
+
+def environment_mismatch(results: dict, baseline: dict) -> list[str]:
+    """Describe environment fields that differ between a run and its baseline"""
+    current = results.get("environment", {})
+    recorded = baseline.get("environment", {})
+    return [f"{key}: baseline {recorded.get(key)!r}, current {current.get(key)!r}"
+            for key in ENVIRONMENT_KEYS if recorded.get(key) != current.get(key)]
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(args) -> dict:
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(ALL_STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+    needs_audio = [s for s in stages if s in AUDIO_STAGES]
+    if needs_audio and not audio_available():
+        raise SystemExit(
+            f"Stages {', '.join(needs_audio)} need speech audio but {AUDIO_PATH} is missing or empty. "
+            f"Run `python benchmark.py --generate-audio` first, or run only segment,youtube."
+        )
+
+    results = {"environment": environment(), "stages": {}}
+    workdir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        video_path = None
+        if {"extract", "video"} & set(stages):
+            video_path = make_benchmark_video(workdir)
+
+        if "extract" in stages:
+            print("Benchmarking audio extraction...")
+            results["stages"]["extract"] = bench_extract(video_path, workdir, args.iterations)
+        if "whisper" in stages:
+            print("Benchmarking Whisper transcription...")
+            results["stages"]["whisper"] = bench_whisper(args.iterations, args.model)
+        if "segment" in stages:
+            print("Benchmarking segment_transcript...")
+            results["stages"]["segment"] = bench_segment(args.iterations * 1000)
+
+        if {"youtube", "youtube_fallback", "video"} & set(stages):
+            with fake_services(args.latency_ms / 1000) as services_url, \
+                    patched_app(services_url) as app, \
+                    app_server(app) as app_url:
+                if "youtube" in stages:
+                    print("Load testing /process-youtube/ (transcript API)...")
+                    results["stages"]["youtube"] = bench_youtube(
+                        app_url, args.requests, args.concurrency, fallback=False)
+                if "youtube_fallback" in stages:
+                    print("Load testing /process-youtube/ (yt-dlp + Whisper fallback)...")
+                    results["stages"]["youtube_fallback"] = bench_youtube(
+                        app_url, args.fallback_requests, args.concurrency, fallback=True)
+                if "video" in stages:
+                    print("Load testing /process-video/...")
+                    results["stages"]["video"] = bench_video(
+                        app_url, video_path, args.fallback_requests, args.concurrency)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the video transcription pipeline")
+    parser.add_argument("--stages", default=",".join(ALL_STAGES),
+                        help=f"Comma-separated stages to run ({', '.join(ALL_STAGES)})")
+    parser.add_argument("--iterations", type=int, default=3,
+                        help="Iterations for the extract/whisper stages (x1000 for segment)")
+    parser.add_argument("--model", default="base", help="Whisper model for the whisper stage")
+    parser.add_argument("--requests", type=int, default=50,
+                        help="Requests per load stage that avoids Whisper")
+    parser.add_argument("--fallback-requests", type=int, default=4,
+                        help="Requests per load stage that runs Whisper")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients for load stages")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Artificial latency added by the fake external services")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON report")
+    parser.add_argument("--tolerance", type=float, default=10.0,
+                        help="Allowed regression against the baseline, in percent")
+    parser.add_argument("--force-compare", action="store_true",
+                        help="Compare against the baseline even if it was recorded on a different machine")
+    parser.add_argument("--generate-audio", action="store_true",
+                        help=f"Synthesize {os.path.basename(GENERATED_AUDIO_PATH)} with espeak-ng and exit")
+    args = parser.parse_args()
+
+    if args.generate_audio:
+        generate_audio()
+        return
+
+    results = run(args)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatch = environment_mismatch(results, baseline)
+        if mismatch and not args.force_compare:
+            # Numbers from another machine would give false (or hidden) regressions
+            print(f"WARNING: skipping baseline comparison, environment differs ({'; '.join(mismatch)}). "
+                  f"Use --force-compare to compare anyway.")
+            results["comparison_skipped"] = mismatch
+        else:
+            for line in mismatch:
+                print(f"WARNING: environment differs from baseline ({line})")
+            results["comparison"] = compare(results, baseline, args.tolerance / 100)
+            regressions = [row for row in results["comparison"] if row["regression"]]
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
+
+    if regressions:
+        for row in regressions:
+            change = f" ({row['change_pct']:+}%)" if row["change_pct"] is not None else ""
+            print(f"REGRESSION {row['stage']}.{row['metric']}: "
+                  f"{row['baseline']} -> {row['current']}{change}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
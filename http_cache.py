@@ -0,0 +1,196 @@
+"""
+Response compression and ETag helpers.
+
+Static content is compressed once up front (gzip, and brotli when the
+`brotli` package is installed); transcription results are compressed the
+first time each encoding is requested and kept alongside the cached result.
+Every representation gets a strong ETag derived from a hash of
+the content. On GET, a matching If-None-Match is answered with 304.
+"""
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, fall back to gzip only
+    brotli = None
+
+# Responses smaller than this are sent uncompressed; the framing overhead
+# outweighs the savings.
+MIN_COMPRESS_SIZE = 500
+
+# Server preference order when the client accepts several encodings equally
+SUPPORTED_ENCODINGS = ["br", "gzip"] if brotli else ["gzip"]
+
+
+def content_hash(data: bytes) -> str:
+    """Hash used as the base of strong ETags"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def make_etag(digest: str, encoding: str = None) -> str:
+    """Strong ETag for one representation (identity, gzip or br) of the content"""
+    if encoding:
+        return f'"{digest}-{encoding}"'
+    return f'"{digest}"'
+
+
+def compress(data: bytes, encoding: str, static: bool = False) -> bytes:
+    """Compress data; static content is compressed at the highest level since it is done once"""
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else 5)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """
+    Pick the best supported content-coding from an Accept-Encoding header.
+    Returns None when the response should be sent uncompressed.
+    """
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        q = qualities.get(coding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(request: Request, digest: str) -> bool:
+    """Check If-None-Match against every representation of the content"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {make_etag(digest)} | {make_etag(digest, enc) for enc in ("br", "gzip")}
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in candidates:
+            return True
+    return False
+
+
+def not_modified(digest: str, encoding: str, headers: dict) -> Response:
+    return Response(status_code=304, headers={**headers, "ETag": make_etag(digest, encoding)})
+
+
+class PrecompressedAsset:
+    """A static response body compressed once, served with ETag revalidation"""
+
+    def __init__(self, content: str, media_type: str, cache_control: str = "public, no-cache"):
+        self.body = content.encode("utf-8")
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.digest = content_hash(self.body)
+        self.encoded = {enc: compress(self.body, enc, static=True) for enc in SUPPORTED_ENCODINGS}
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request, self.digest):
+            return not_modified(self.digest, encoding, headers)
+
+        body = self.body
+        if encoding:
+            body = self.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        headers["ETag"] = make_etag(self.digest, encoding)
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+def encoded_response(request: Request, body: bytes, digest: str, cache_control: str,
+                     extra_headers: dict = None, media_type: str = "application/json",
+                     revalidate: bool = True, encoded: dict = None) -> Response:
+    """
+    Send an already-serialized body with a strong ETag, compressing when the
+    client accepts it. With revalidate, a matching If-None-Match gets a 304;
+    pass revalidate=False for POST, where 304 is not a valid answer.
+    If given, `encoded` maps encoding -> compressed body and is filled in so
+    later responses for the same body skip compression.
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if len(body) < MIN_COMPRESS_SIZE:
+        encoding = None
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding", **(extra_headers or {})}
+    if revalidate and etag_matches(request, digest):
+        return not_modified(digest, encoding, headers)
+
+    if encoding:
+        if encoded is None:
+            body = compress(body, encoding)
+        else:
+            if encoding not in encoded:
+                encoded[encoding] = compress(body, encoding)
+            body = encoded[encoding]
+        headers["Content-Encoding"] = encoding
+    headers["ETag"] = make_etag(digest, encoding)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+class CachedResult:
+    """A serialized result plus the compressed variants produced so far"""
+
+    def __init__(self, digest: str, body: bytes):
+        self.digest = digest
+        self.body = body
+        self.encoded = {}
+
+
+class ResultCache:
+    """
+    Bounded in-memory store of recent transcription results keyed by their
+    content hash, so a result can be re-fetched (and revalidated) by GET.
+    Least recently used results are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def put(self, payload: dict) -> CachedResult:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = content_hash(body)
+        with self._lock:
+            # Identical results share an entry, keeping any variants already compressed
+            entry = self._entries.get(digest) or CachedResult(digest, body)
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, digest: str) -> CachedResult:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+            return entry
@@ -1,7 +1,8 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.concurrency import run_in_threadpool
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -9,7 +10,9 @@ from supabase import create_client
 import os
 import tempfile
 from dotenv import load_dotenv
-from transcribe import transcribe_video, get_youtube_video_id
+from transcribe import transcribe_video, transcribe_youtube_audio, get_youtube_transcript, get_youtube_video_id
+from http_cache import PrecompressedAsset, ResultCache, encoded_response
+from scheduler import TranscriptionScheduler
 import re
 from urllib.parse import urlencode
 import logging
@@ -66,6 +69,10 @@ else:
     supabase = None
     logger.warning("Supabase credentials not found. File upload will be disabled.")
 
+# Limits concurrent transcriptions and their torch/ffmpeg threads so they
+# don't oversubscribe the CPU (run `python scheduler.py autotune` to tune)
+scheduler = TranscriptionScheduler()
+
 def segment_transcript(transcript: str, max_length: int = 100) -> list[str]:
     """
     Segment transcript into smaller chunks suitable for sign.mt input.
@@ -106,9 +113,7 @@ def get_sign_mt_url(text: str) -> str:
     params = {"text": text}
     return f"{base_url}?{urlencode(params)}"
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    return """
+INDEX_HTML = """
     <html>
         <head>
             <title>Video Transit to Sign Language Research Prototype</title>
@@ -411,6 +416,28 @@ async def root():
     </html>
     """
 
+# The UI page never changes at runtime, so compress it once at startup
+INDEX_PAGE = PrecompressedAsset(INDEX_HTML, "text/html; charset=utf-8")
+
+# Recent results, re-fetchable by ETag via GET /results/{result_id}
+RESULT_CACHE = ResultCache()
+
+def result_response(request: Request, payload: dict) -> Response:
+    """
+    Store a transcription result and return it compressed with its ETag.
+    POST responses are never answered with 304; revalidate via GET /results/{result_id}.
+    """
+    entry = RESULT_CACHE.put(payload)
+    return encoded_response(
+        request, entry.body, entry.digest, "private, no-cache",
+        extra_headers={"Content-Location": f"/results/{entry.digest}"},
+        revalidate=False, encoded=entry.encoded
+    )
+
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    return INDEX_PAGE.response(request)
+
 @app.post("/upload-video/")
 @limiter.limit("10/minute")
 async def upload_video(request: Request, file: UploadFile = File(...)):
@@ -462,7 +489,7 @@ async def upload_video(request: Request, file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.post("/transcribe-video/")
-async def transcribe_video_endpoint(file: UploadFile = File(...)):
+async def transcribe_video_endpoint(request: Request, file: UploadFile = File(...)):
     """Transcribe video without uploading to Supabase"""
     if not file.content_type.startswith('video/'):
         raise HTTPException(status_code=400, detail="File must be a video")
@@ -475,12 +502,12 @@ async def transcribe_video_endpoint(file: UploadFile = File(...)):
             temp_file_path = temp_file.name
         
         # Transcribe the video
-        transcription = transcribe_video(temp_file_path)
+        transcription = await scheduler.run(transcribe_video, temp_file_path)
         
         # Clean up temporary file
         os.unlink(temp_file_path)
         
-        return {"transcription": transcription, "filename": file.filename}
+        return result_response(request, {"transcription": transcription, "filename": file.filename})
     
     except Exception as e:
         # Clean up temporary file on error
@@ -503,7 +530,12 @@ async def process_youtube(request: Request, youtube_url: dict):
         logger.info(f"Processing YouTube URL: {url}")
         
         try:
-            transcription = transcribe_video(url)
+            # Captions are a plain HTTP fetch, so only the Whisper fallback takes a job slot
+            try:
+                transcription = await run_in_threadpool(get_youtube_transcript, url)
+            except Exception as e:
+                logger.info(f"YouTube transcript not available, falling back to Whisper: {str(e)}")
+                transcription = await scheduler.run(transcribe_youtube_audio, url)
         except Exception as e:
             logger.error(f"Transcription error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
@@ -511,11 +543,11 @@ async def process_youtube(request: Request, youtube_url: dict):
         segments = segment_transcript(transcription)
         logger.info(f"Successfully processed YouTube video: {url}")
         
-        return {
+        return result_response(request, {
             "transcription": transcription,
             "segments": segments,
             "youtube_url": url
-        }
+        })
     
     except Exception as e:
         logger.error(f"Error processing YouTube URL: {str(e)}")
@@ -550,7 +582,7 @@ async def process_video(request: Request, file: UploadFile = File(...)):
                 temp_file.write(chunk)
         
         logger.info(f"Processing video file: {file.filename}")
-        transcription = transcribe_video(temp_file_path)
+        transcription = await scheduler.run(transcribe_video, temp_file_path)
         segments = segment_transcript(transcription)
         
         result = {
@@ -562,14 +594,14 @@ async def process_video(request: Request, file: UploadFile = File(...)):
         if supabase:
             try:
                 file.file.seek(0)
-                upload_result = await upload_video(file)
+                upload_result = await upload_video(request=request, file=file)
                 result["upload_result"] = upload_result
             except Exception as upload_error:
                 logger.warning(f"Upload to Supabase failed: {str(upload_error)}")
                 result["upload_error"] = str(upload_error)
         
         logger.info(f"Successfully processed video: {file.filename}")
-        return result
+        return result_response(request, result)
     
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
@@ -580,9 +612,24 @@ async def process_video(request: Request, file: UploadFile = File(...)):
             os.unlink(temp_file_path)
             logger.debug(f"Cleaned up temporary file: {temp_file_path}")
 
+@app.get("/results/{result_id}")
+async def get_result(request: Request, result_id: str):
+    """
+    Re-fetch a recent transcription result by the ID given in the
+    Content-Location header. Supports If-None-Match revalidation.
+    """
+    entry = RESULT_CACHE.get(result_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    return encoded_response(request, entry.body, entry.digest, "private, max-age=3600", encoded=entry.encoded)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "supabase_configured": supabase is not None}
+    return {
+        "status": "healthy",
+        "supabase_configured": supabase is not None,
+        "scheduler": scheduler.status()
+    }
 
 if __name__ == "__main__":
     import uvicorn
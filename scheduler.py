@@ -0,0 +1,369 @@
+"""
+CPU thread partitioning for concurrent transcriptions.
+
+Whisper (through torch) and ffmpeg each default to using every core, so two
+transcriptions running at once oversubscribe the CPU and both slow down.
+The scheduler plans how many transcriptions run at once and how many
+torch/ffmpeg threads each one gets, from the core count (including any
+container CPU quota), available memory, and an optional autotuned
+configuration. Before each job starts, the number of jobs allowed to run
+is re-checked against the current load.
+
+Autotune on the deployment box (stores the best plan in scheduler_config.json):
+    python scheduler.py autotune
+    python scheduler.py show
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from fastapi.concurrency import run_in_threadpool
+
+from benchmark import AUDIO_PATH
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.getenv(
+    "SCHEDULER_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "scheduler_config.json")
+)
+CGROUP_ROOT = "/sys/fs/cgroup"
+MEMINFO_PATH = "/proc/meminfo"
+
+# Whisper's CPU inference stops scaling well past a handful of threads, so
+# without a tuned config the cores are split into jobs of about this size.
+DEFAULT_THREADS_PER_JOB = 4
+
+# Rough peak memory of one transcription with the "base" Whisper model; each
+# job loads its own copy of the model.
+JOB_MEMORY_BYTES = 1024 ** 3
+
+# How often a waiting job re-checks the load when no running job has finished
+ADMISSION_POLL_SECONDS = 1.0
+
+
+@dataclass
+class ThreadPlan:
+    """How many transcriptions run at once and how many torch/ffmpeg threads each one gets"""
+    jobs: int
+    threads_per_job: int
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: str = CGROUP_ROOT) -> float:
+    """
+    CPU quota of this process's cgroup in cores (v2 cpu.max, falling back to
+    v1 cfs_quota_us/cfs_period_us), or None when there is no quota.
+    """
+    try:
+        cpu_max = _read(os.path.join(root, "cpu.max"))
+        if cpu_max:
+            quota, _, period = cpu_max.partition(" ")
+            if quota == "max":
+                return None
+            return int(quota) / int(period or 100000)
+
+        for cpu_dir in ("cpu", "cpu,cpuacct"):
+            quota = _read(os.path.join(root, cpu_dir, "cpu.cfs_quota_us"))
+            period = _read(os.path.join(root, cpu_dir, "cpu.cfs_period_us"))
+            if quota and period:
+                if int(quota) <= 0:
+                    return None
+                return int(quota) / int(period)
+    except ValueError:
+        pass
+    return None
+
+
+def cpu_count(root: str = CGROUP_ROOT) -> int:
+    """
+    Cores available to this process: the CPU affinity count, capped by the
+    cgroup quota (containers see the host's cores through affinity).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        cores = min(cores, max(1, int(limit)))
+    return cores
+
+
+def system_load(root: str = CGROUP_ROOT) -> float:
+    """
+    1-minute load average, or 0 where the platform does not provide it.
+    Inside a CPU-limited cgroup the load average is the host's, so it is
+    ignored there.
+    """
+    if cgroup_cpu_limit(root) is not None:
+        return 0.0
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 0.0
+
+
+def available_memory(root: str = CGROUP_ROOT, meminfo_path: str = MEMINFO_PATH) -> int:
+    """Bytes of memory available to this process, or None if unknown"""
+    limits = []
+    for path in (os.path.join(root, "memory.max"), os.path.join(root, "memory", "memory.limit_in_bytes")):
+        value = _read(path)
+        # v1 reports "unlimited" as a huge number close to 2**63
+        if value and value.isdigit() and int(value) < 2 ** 60:
+            limits.append(int(value))
+    meminfo = _read(meminfo_path)
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith("MemAvailable:"):
+                limits.append(int(line.split()[1]) * 1024)
+    return min(limits) if limits else None
+
+
+def memory_job_limit(root: str = CGROUP_ROOT, meminfo_path: str = MEMINFO_PATH) -> int:
+    """How many jobs fit in memory, or None if memory is unknown"""
+    memory = available_memory(root, meminfo_path)
+    if memory is None:
+        return None
+    return max(1, memory // JOB_MEMORY_BYTES)
+
+
+def default_plan(cores: int = None, max_jobs: int = None) -> ThreadPlan:
+    """Heuristic plan from the core count, capped at max_jobs concurrent jobs"""
+    cores = cores or cpu_count()
+    jobs = max(1, cores // DEFAULT_THREADS_PER_JOB)
+    if max_jobs:
+        jobs = max(1, min(jobs, max_jobs))
+    threads = max(1, cores // jobs)
+    return ThreadPlan(jobs=jobs, threads_per_job=threads)
+
+
+def valid_plan(plan: ThreadPlan, cores: int) -> bool:
+    """A plan needs at least one job and thread, and must fit within the cores"""
+    return (
+        isinstance(plan.jobs, int) and isinstance(plan.threads_per_job, int)
+        and plan.jobs >= 1 and plan.threads_per_job >= 1
+        and plan.jobs * plan.threads_per_job <= cores
+    )
+
+
+def load_plan(path: str = CONFIG_PATH) -> ThreadPlan:
+    """
+    Load the autotuned plan, or None if there is none, it is invalid, or it
+    was tuned for a machine with a different core count.
+    """
+    if not os.path.exists(path):
+        return None
+    cores = cpu_count()
+    try:
+        with open(path) as f:
+            config = json.load(f)
+        if config.get("cpu_count") != cores:
+            logger.warning(f"Ignoring {path}: tuned for {config.get('cpu_count')} cores, have {cores}")
+            return None
+        plan = ThreadPlan(**config["plan"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring invalid scheduler config {path}: {str(e)}")
+        return None
+    if not valid_plan(plan, cores):
+        logger.warning(f"Ignoring invalid scheduler plan in {path}: {asdict(plan)} on {cores} cores")
+        return None
+    return plan
+
+
+def apply_thread_limits(threads: int):
+    """
+    Set torch's intra-op thread count. This is process-wide, so it is set once
+    per plan rather than per job; concurrent jobs share the same value.
+    """
+    import torch
+    torch.set_num_threads(threads)
+
+
+class TranscriptionScheduler:
+    """
+    Runs transcriptions in the threadpool with at most `plan.jobs` at a time,
+    each with `plan.threads_per_job` torch and ffmpeg threads. Torch threads
+    are set once for the whole process. Jobs are admitted one at a time while
+    the current load leaves room for them (see allowed_jobs).
+    """
+
+    def __init__(self, plan: ThreadPlan = None, config_path: str = CONFIG_PATH):
+        self.plan = plan or load_plan(config_path) or default_plan(max_jobs=memory_job_limit())
+        self.cores = cpu_count()
+        self._condition = asyncio.Condition()
+        self._active = 0
+        apply_thread_limits(self.plan.threads_per_job)
+        logger.info(f"Transcription scheduler: {asdict(self.plan)} on {self.cores} cores")
+
+    def allowed_jobs(self) -> int:
+        """
+        Jobs allowed to run right now: the planned count, reduced when load
+        from outside this scheduler leaves fewer cores free. Always at least
+        one, so requests are never starved.
+        """
+        own_load = self._active * self.plan.threads_per_job
+        external = max(0.0, system_load() - own_load)
+        free = max(0, self.cores - int(round(external)))
+        return max(1, min(self.plan.jobs, free // self.plan.threads_per_job))
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, threads=..., **kwargs) in the threadpool once the load admits another job"""
+        async with self._condition:
+            while self._active >= self.allowed_jobs():
+                try:
+                    await asyncio.wait_for(self._condition.wait(), ADMISSION_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            self._active += 1
+        try:
+            return await run_in_threadpool(fn, *args, threads=self.plan.threads_per_job, **kwargs)
+        finally:
+            async with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    def status(self) -> dict:
+        return {
+            **asdict(self.plan),
+            "cores": self.cores,
+            "active_jobs": self._active,
+            "allowed_jobs": self.allowed_jobs(),
+        }
+
+
+def candidate_plans(cores: int) -> list[ThreadPlan]:
+    """
+    Splits of the cores worth benchmarking: power-of-two thread counts plus
+    one job using every core, each with as many jobs as fit. Splits that
+    leave cores idle without adding a job (e.g. 1x8 on 12 cores) are dropped.
+    """
+    thread_counts = {cores}
+    threads = 1
+    while threads < cores:
+        thread_counts.add(threads)
+        threads *= 2
+
+    best_by_jobs = {}
+    for threads in sorted(thread_counts):
+        jobs = cores // threads
+        # For the same job count, more threads per job dominates fewer
+        best_by_jobs[jobs] = max(threads, best_by_jobs.get(jobs, 0))
+    return [ThreadPlan(jobs=jobs, threads_per_job=threads)
+            for jobs, threads in sorted(best_by_jobs.items())]
+
+
+def benchmark_plan(plan: ThreadPlan, audio_path: str, rounds: int) -> dict:
+    """Run `rounds` batches of `plan.jobs` concurrent transcriptions and measure throughput"""
+    import ffmpeg
+    from transcribe import transcribe_video
+
+    audio_seconds = float(ffmpeg.probe(audio_path)["format"]["duration"])
+
+    def job(_):
+        transcribe_video(audio_path, threads=plan.threads_per_job)
+
+    apply_thread_limits(plan.threads_per_job)
+    total = plan.jobs * rounds
+    with ThreadPoolExecutor(max_workers=plan.jobs) as pool:
+        start = time.perf_counter()
+        list(pool.map(job, range(total)))
+        wall = time.perf_counter() - start
+
+    return {
+        "plan": asdict(plan),
+        "transcriptions": total,
+        "wall_s": round(wall, 3),
+        "audio_seconds_per_s": round(total * audio_seconds / wall, 4),
+    }
+
+
+def autotune(audio_path: str = AUDIO_PATH, rounds: int = 2, max_jobs: int = None,
+             config_path: str = CONFIG_PATH) -> dict:
+    """
+    Benchmark the candidate plans on audio_path and store the one with the
+    best aggregate throughput. max_jobs defaults to how many jobs fit in memory.
+    """
+    if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+        raise FileNotFoundError(f"Autotune audio missing or empty: {audio_path}")
+
+    cores = cpu_count()
+    if system_load() > 0.5:
+        logger.warning(f"Load average is {system_load():.1f}; autotune results may be skewed")
+    if max_jobs is None:
+        max_jobs = memory_job_limit()
+        if max_jobs:
+            print(f"Limiting to {max_jobs} concurrent job(s) to fit in available memory")
+
+    results = []
+    for plan in candidate_plans(cores):
+        if max_jobs and plan.jobs > max_jobs:
+            continue
+        print(f"Benchmarking {plan.jobs} job(s) x {plan.threads_per_job} thread(s)...")
+        result = benchmark_plan(plan, audio_path, rounds)
+        print(f"  {result['audio_seconds_per_s']} audio seconds/s")
+        results.append(result)
+
+    best = max(results, key=lambda r: r["audio_seconds_per_s"])
+    config = {
+        "cpu_count": cores,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "plan": best["plan"],
+        "results": results,
+    }
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+    print(f"Best plan {best['plan']} saved to {config_path}")
+    return config
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Transcription CPU scheduler")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tune = subparsers.add_parser("autotune", help="Benchmark thread partitions and store the best one")
+    tune.add_argument("--audio", default=AUDIO_PATH, help="Audio file to transcribe")
+    tune.add_argument("--rounds", type=int, default=2, help="Batches of concurrent jobs per plan")
+    tune.add_argument("--max-jobs", type=int,
+                      help="Skip plans with more concurrent jobs than this (default: what fits in memory)")
+    tune.add_argument("--config", default=CONFIG_PATH, help="Where to store the tuned plan")
+
+    show = subparsers.add_parser("show", help="Print the plan the app would use right now")
+    show.add_argument("--config", default=CONFIG_PATH, help="Tuned plan to load")
+
+    args = parser.parse_args()
+    if args.command == "autotune":
+        try:
+            autotune(args.audio, args.rounds, args.max_jobs, args.config)
+        except FileNotFoundError as e:
+            raise SystemExit(f"{str(e)}. Generate speech audio with `python benchmark.py --generate-audio` "
+                             f"or pass --audio with a real clip.")
+    else:
+        plan = load_plan(args.config)
+        source = "autotuned" if plan else "default"
+        plan = plan or default_plan(max_jobs=memory_job_limit())
+        print(json.dumps({
+            "source": source,
+            "cores": cpu_count(),
+            "cgroup_cpu_limit": cgroup_cpu_limit(),
+            "load": system_load(),
+            "memory_job_limit": memory_job_limit(),
+            **asdict(plan),
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
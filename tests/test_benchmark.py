@@ -0,0 +1,72 @@
+import benchmark
+
+
+def report(stages, cpu_count=8, platform="Linux-test"):
+    return {"environment": {"cpu_count": cpu_count, "platform": platform}, "stages": stages}
+
+
+def rows_by_metric(rows):
+    return {row["metric"]: row for row in rows}
+
+
+def test_percentile_interpolates():
+    assert benchmark.percentile([1, 2, 3, 4], 50) == 2.5
+    assert benchmark.percentile([1, 2, 3, 4], 100) == 4
+    assert benchmark.percentile([], 95) == 0.0
+
+
+def test_summarize_counts_only_successes_in_throughput():
+    summary = benchmark.summarize([], 0.4, errors=4)
+    assert summary["count"] == 0
+    assert summary["errors"] == 4
+    assert summary["throughput_per_s"] == 0.0
+
+    summary = benchmark.summarize([2, 2, 2, 2], 8.0, errors=4)
+    assert summary["throughput_per_s"] == 0.5
+
+
+def test_compare_flags_failed_run_as_regression():
+    baseline = report({"video": benchmark.summarize([2, 2, 2, 2], 8.0)})
+    current = report({"video": benchmark.summarize([], 0.4, errors=4)})
+
+    rows = rows_by_metric(benchmark.compare(current, baseline, 0.1))
+    assert rows["errors"]["regression"]
+    assert rows["throughput_per_s"]["regression"]
+    # No samples, so percentiles are not compared
+    assert "p50_ms" not in rows
+
+
+def test_compare_flags_any_errors_even_if_faster():
+    baseline = report({"video": benchmark.summarize([2, 2], 4.0)})
+    current = report({"video": benchmark.summarize([1, 1], 2.0, errors=1)})
+
+    rows = rows_by_metric(benchmark.compare(current, baseline, 0.1))
+    assert rows["errors"]["regression"]
+    assert not rows["p50_ms"]["regression"]
+
+
+def test_compare_fewer_errors_than_baseline_is_not_a_regression():
+    baseline = report({"video": benchmark.summarize([2, 2], 4.0, errors=2)})
+    current = report({"video": benchmark.summarize([2, 2], 4.0)})
+
+    rows = benchmark.compare(current, baseline, 0.1)
+    assert not any(row["regression"] for row in rows)
+
+
+def test_compare_respects_metric_direction_and_tolerance():
+    baseline = report({"segment": {"count": 10, "p50_ms": 100.0, "chars_per_s": 1000.0}})
+    slower = report({"segment": {"count": 10, "p50_ms": 120.0, "chars_per_s": 800.0}})
+    within = report({"segment": {"count": 10, "p50_ms": 105.0, "chars_per_s": 960.0}})
+
+    rows = rows_by_metric(benchmark.compare(slower, baseline, 0.1))
+    assert rows["p50_ms"]["regression"]
+    assert rows["chars_per_s"]["regression"]
+    assert not any(row["regression"] for row in benchmark.compare(within, baseline, 0.1))
+
+
+def test_environment_mismatch():
+    assert benchmark.environment_mismatch(report({}), report({})) == []
+
+    mismatch = benchmark.environment_mismatch(report({}, cpu_count=2), report({}, cpu_count=64))
+    assert len(mismatch) == 1
+    assert mismatch[0].startswith("cpu_count")
@@ -0,0 +1,113 @@
+import gzip
+
+from fastapi import Request
+
+import http_cache
+
+
+def make_request(**headers):
+    raw = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_choose_encoding_prefers_server_order(monkeypatch):
+    monkeypatch.setattr(http_cache, "SUPPORTED_ENCODINGS", ["br", "gzip"])
+    assert http_cache.choose_encoding("gzip, deflate, br") == "br"
+    assert http_cache.choose_encoding("gzip") == "gzip"
+    assert http_cache.choose_encoding("deflate") is None
+    assert http_cache.choose_encoding("") is None
+    assert http_cache.choose_encoding(None) is None
+
+
+def test_choose_encoding_q_values(monkeypatch):
+    monkeypatch.setattr(http_cache, "SUPPORTED_ENCODINGS", ["br", "gzip"])
+    assert http_cache.choose_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert http_cache.choose_encoding("br;q=0, gzip") == "gzip"
+    assert http_cache.choose_encoding("gzip;q=0, br;q=0") is None
+    assert http_cache.choose_encoding("gzip;q=bogus") is None
+
+
+def test_choose_encoding_wildcard(monkeypatch):
+    monkeypatch.setattr(http_cache, "SUPPORTED_ENCODINGS", ["br", "gzip"])
+    assert http_cache.choose_encoding("*") == "br"
+    assert http_cache.choose_encoding("*, br;q=0") == "gzip"
+    assert http_cache.choose_encoding("*;q=0") is None
+
+
+def test_etag_matches():
+    digest = "abc123"
+    assert not http_cache.etag_matches(make_request(), digest)
+    assert http_cache.etag_matches(make_request(if_none_match='"abc123"'), digest)
+    assert http_cache.etag_matches(make_request(if_none_match='"abc123-gzip"'), digest)
+    assert http_cache.etag_matches(make_request(if_none_match='W/"abc123-br"'), digest)
+    assert http_cache.etag_matches(make_request(if_none_match='"other", W/"abc123"'), digest)
+    assert http_cache.etag_matches(make_request(if_none_match="*"), digest)
+    assert not http_cache.etag_matches(make_request(if_none_match='"other", "abc1234"'), digest)
+
+
+def test_encoded_response_revalidation():
+    cache = http_cache.ResultCache()
+    entry = cache.put({"transcription": "hello " * 200})
+    etag = http_cache.make_etag(entry.digest)
+
+    response = http_cache.encoded_response(
+        make_request(if_none_match=etag), entry.body, entry.digest, "private")
+    assert response.status_code == 304
+
+    # POST responses never answer If-None-Match
+    response = http_cache.encoded_response(
+        make_request(if_none_match=etag), entry.body, entry.digest, "private", revalidate=False)
+    assert response.status_code == 200
+    assert response.body == entry.body
+
+
+def test_encoded_response_reuses_cached_variants(monkeypatch):
+    cache = http_cache.ResultCache()
+    entry = cache.put({"transcription": "hello " * 200})
+
+    calls = []
+    original = http_cache.compress
+    monkeypatch.setattr(http_cache, "compress", lambda data, enc: calls.append(enc) or original(data, enc))
+
+    for _ in range(3):
+        response = http_cache.encoded_response(
+            make_request(accept_encoding="gzip"), entry.body, entry.digest, "private", encoded=entry.encoded)
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"] == http_cache.make_etag(entry.digest, "gzip")
+        assert gzip.decompress(response.body) == entry.body
+    assert calls == ["gzip"]
+
+
+def test_small_bodies_are_not_compressed():
+    response = http_cache.encoded_response(make_request(accept_encoding="gzip"), b"{}", "d", "private")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"d"'
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = http_cache.ResultCache(max_entries=2)
+    first = cache.put({"n": 1})
+    second = cache.put({"n": 2})
+    assert cache.get(first.digest) is first  # touch first so second is now oldest
+    third = cache.put({"n": 3})
+
+    assert cache.get(second.digest) is None
+    assert cache.get(first.digest) is first
+    assert cache.get(third.digest) is third
+
+
+def test_result_cache_reuses_entry_for_identical_result():
+    cache = http_cache.ResultCache()
+    entry = cache.put({"n": 1})
+    entry.encoded["gzip"] = b"compressed"
+    assert cache.put({"n": 1}) is entry
+
+
+def test_precompressed_asset():
+    asset = http_cache.PrecompressedAsset("<html>" + "x" * 2000 + "</html>", "text/html")
+    response = asset.response(make_request(accept_encoding="gzip"))
+    assert response.status_code == 200
+    assert gzip.decompress(response.body) == asset.body
+
+    response = asset.response(make_request(accept_encoding="gzip", if_none_match=response.headers["etag"]))
+    assert response.status_code == 304
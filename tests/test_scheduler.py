@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import scheduler
+from scheduler import ThreadPlan
+
+
+@pytest.fixture
+def cgroup(tmp_path):
+    def write(relative, content):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    write.root = str(tmp_path)
+    return write
+
+
+@pytest.fixture
+def host_cores(monkeypatch):
+    monkeypatch.setattr(scheduler.os, "sched_getaffinity", lambda pid: set(range(64)), raising=False)
+
+
+def test_cgroup_v2_quota_caps_cpu_count(cgroup, host_cores):
+    cgroup("cpu.max", "200000 100000\n")
+    assert scheduler.cgroup_cpu_limit(cgroup.root) == 2.0
+    assert scheduler.cpu_count(cgroup.root) == 2
+
+
+def test_cgroup_v2_unlimited(cgroup, host_cores):
+    cgroup("cpu.max", "max 100000\n")
+    assert scheduler.cgroup_cpu_limit(cgroup.root) is None
+    assert scheduler.cpu_count(cgroup.root) == 64
+
+
+def test_cgroup_v1_quota(cgroup, host_cores):
+    cgroup("cpu,cpuacct/cpu.cfs_quota_us", "150000")
+    cgroup("cpu,cpuacct/cpu.cfs_period_us", "100000")
+    assert scheduler.cgroup_cpu_limit(cgroup.root) == 1.5
+    assert scheduler.cpu_count(cgroup.root) == 1
+
+
+def test_cgroup_v1_unlimited(cgroup, host_cores):
+    cgroup("cpu/cpu.cfs_quota_us", "-1")
+    cgroup("cpu/cpu.cfs_period_us", "100000")
+    assert scheduler.cgroup_cpu_limit(cgroup.root) is None
+
+
+def test_host_load_ignored_inside_cpu_limited_cgroup(cgroup, monkeypatch):
+    monkeypatch.setattr(scheduler.os, "getloadavg", lambda: (48.0, 40.0, 30.0))
+    assert scheduler.system_load(cgroup.root) == 48.0
+    cgroup("cpu.max", "200000 100000")
+    assert scheduler.system_load(cgroup.root) == 0.0
+
+
+def test_memory_job_limit(cgroup, tmp_path):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(f"MemTotal: {64 * 1024 ** 2} kB\nMemAvailable: {8 * 1024 ** 2} kB\n")
+    assert scheduler.memory_job_limit(cgroup.root, str(meminfo)) == 8
+
+    cgroup("memory.max", str(3 * 1024 ** 3))
+    assert scheduler.memory_job_limit(cgroup.root, str(meminfo)) == 3
+
+    cgroup("memory.max", "max")
+    cgroup("memory/memory.limit_in_bytes", str(2 ** 63 - 4096))
+    assert scheduler.memory_job_limit(cgroup.root, str(meminfo)) == 8
+
+    assert scheduler.memory_job_limit(cgroup.root, str(tmp_path / "missing")) is None
+
+
+def test_default_plan():
+    assert scheduler.default_plan(16) == ThreadPlan(jobs=4, threads_per_job=4)
+    assert scheduler.default_plan(2) == ThreadPlan(jobs=1, threads_per_job=2)
+    assert scheduler.default_plan(64, max_jobs=2) == ThreadPlan(jobs=2, threads_per_job=32)
+    plan = scheduler.default_plan(6)
+    assert plan.jobs * plan.threads_per_job <= 6
+
+
+def test_candidate_plans_use_every_core_or_power_of_two():
+    plans = [(p.jobs, p.threads_per_job) for p in scheduler.candidate_plans(12)]
+    assert plans == [(1, 12), (3, 4), (6, 2), (12, 1)]
+
+    plans = scheduler.candidate_plans(64)
+    assert len(plans) == 7
+    assert all(p.jobs * p.threads_per_job == 64 for p in plans)
+
+    assert scheduler.candidate_plans(1) == [ThreadPlan(jobs=1, threads_per_job=1)]
+
+
+def write_config(tmp_path, plan, cpu_count=8):
+    path = tmp_path / "scheduler_config.json"
+    path.write_text(json.dumps({"cpu_count": cpu_count, "plan": plan}))
+    return str(path)
+
+
+@pytest.mark.parametrize("plan", [
+    {"jobs": 0, "threads_per_job": 0},
+    {"jobs": 2, "threads_per_job": 0},
+    {"jobs": -1, "threads_per_job": 4},
+    {"jobs": 4, "threads_per_job": 4},
+    {"jobs": "2", "threads_per_job": 4},
+    {"jobs": 2},
+])
+def test_load_plan_rejects_invalid_plans(tmp_path, monkeypatch, plan):
+    monkeypatch.setattr(scheduler, "cpu_count", lambda root=None: 8)
+    assert scheduler.load_plan(write_config(tmp_path, plan)) is None
+
+
+def test_load_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "cpu_count", lambda root=None: 8)
+    path = write_config(tmp_path, {"jobs": 2, "threads_per_job": 4})
+    assert scheduler.load_plan(path) == ThreadPlan(jobs=2, threads_per_job=4)
+
+    path = write_config(tmp_path, {"jobs": 2, "threads_per_job": 4}, cpu_count=16)
+    assert scheduler.load_plan(path) is None
+    assert scheduler.load_plan(str(tmp_path / "missing.json")) is None
+
+
+def run_jobs(monkeypatch, plan, load, count):
+    """Run `count` jobs through a scheduler and return the peak concurrency"""
+    monkeypatch.setattr(scheduler, "apply_thread_limits", lambda threads: None)
+    monkeypatch.setattr(scheduler, "cpu_count", lambda root=None: 4)
+    monkeypatch.setattr(scheduler, "system_load", lambda root=None: load)
+    monkeypatch.setattr(scheduler, "ADMISSION_POLL_SECONDS", 0.01)
+
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0, "threads": set()}
+
+    def job(threads):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            state["threads"].add(threads)
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+
+    async def go():
+        sched = scheduler.TranscriptionScheduler(plan)
+        await asyncio.gather(*[sched.run(job) for _ in range(count)])
+        return sched
+
+    sched = asyncio.run(go())
+    assert sched.status()["active_jobs"] == 0
+    assert state["threads"] == {plan.threads_per_job}
+    return state["peak"]
+
+
+def test_scheduler_caps_concurrency_at_plan(monkeypatch):
+    assert run_jobs(monkeypatch, ThreadPlan(jobs=2, threads_per_job=2), load=0.0, count=6) == 2
+
+
+def test_scheduler_admits_fewer_jobs_under_external_load(monkeypatch):
+    # Load of 3 on 4 cores leaves room for one 2-thread job, but never zero
+    assert run_jobs(monkeypatch, ThreadPlan(jobs=2, threads_per_job=2), load=3.0, count=4) == 1
+    assert run_jobs(monkeypatch, ThreadPlan(jobs=2, threads_per_job=2), load=50.0, count=3) == 1
@@ -5,6 +5,7 @@ from pathlib import Path
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 import yt_dlp
+import uuid
 
 def get_youtube_video_id(url: str) -> str:
     """Extract video ID from YouTube URL"""
@@ -18,7 +19,7 @@ def get_youtube_video_id(url: str) -> str:
         return parsed_url.path[1:]
     return None
 
-def download_youtube_audio(url: str, output_path: str = "temp_audio.wav"):
+def download_youtube_audio(url: str, output_path: str = "temp_audio.wav", threads: int = None):
     """Download audio from YouTube video"""
     ydl_opts = {
         'format': 'bestaudio/best',
@@ -29,6 +30,9 @@ def download_youtube_audio(url: str, output_path: str = "temp_audio.wav"):
         'outtmpl': output_path.replace('.wav', ''),
         'quiet': True
     }
+    if threads:
+        # Decode threads are an input option for ffmpeg
+        ydl_opts['postprocessor_args'] = {'extractaudio+ffmpeg_i': ['-threads', str(threads)]}
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         ydl.download([url])
 
@@ -66,35 +70,51 @@ def get_youtube_transcript(url: str) -> str:
     except Exception as e:
         raise Exception(f"Failed to get YouTube transcript: {str(e)}")
 
-def transcribe_video(video_path: str, audio_path: str = "temp_audio.wav") -> str:
+def transcribe_youtube_audio(url: str, audio_path: str = None, threads: int = None) -> str:
+    """
+    Download audio from a YouTube video and transcribe it using Whisper.
+    threads limits ffmpeg's thread count; torch threads are set by the caller (see scheduler.py).
+    """
+    if audio_path is None:
+        audio_path = f"temp_audio_{uuid.uuid4().hex}.wav"
+    try:
+        # Download audio from YouTube
+        download_youtube_audio(url, audio_path, threads)
+        # Transcribe with Whisper
+        model = whisper.load_model("base")
+        transcription = model.transcribe(audio_path)
+        return transcription["text"]
+    finally:
+        # Clean up temporary audio file
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+def transcribe_video(video_path: str, audio_path: str = None, threads: int = None) -> str:
     """
     Extract audio from video and transcribe it using Whisper.
     For YouTube videos, tries to get transcript first, falls back to Whisper if no transcript available.
+    threads limits ffmpeg's thread count; torch threads are set by the caller (see scheduler.py).
     """
+    # Unique temp file per call so concurrent transcriptions don't clobber each other
+    if audio_path is None:
+        audio_path = f"temp_audio_{uuid.uuid4().hex}.wav"
+
     # Check if it's a YouTube URL
     if video_path.startswith(('http://', 'https://')):
         try:
             return get_youtube_transcript(video_path)
         except Exception as e:
             print(f"YouTube transcript not available, falling back to Whisper: {str(e)}")
-            try:
-                # Download audio from YouTube
-                download_youtube_audio(video_path, audio_path)
-                # Transcribe with Whisper
-                model = whisper.load_model("base")
-                transcription = model.transcribe(audio_path)
-                return transcription["text"]
-            finally:
-                # Clean up temporary audio file
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+            return transcribe_youtube_audio(video_path, audio_path, threads)
     
     # Regular video file processing
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video file not found: {video_path}")
 
     # Extract audio from video
-    ffmpeg.input(video_path).output(audio_path, format="wav").run(overwrite_output=True, quiet=True)
+    # Decode threads are an input option; the PCM WAV encode is single-threaded anyway
+    input_options = {"threads": threads} if threads else {}
+    ffmpeg.input(video_path, **input_options).output(audio_path, format="wav").run(overwrite_output=True, quiet=True)
 
     try:
         # Load Whisper model and transcribe